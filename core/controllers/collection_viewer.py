@@ -25,7 +25,6 @@ from core.domain import exp_services
 from core.domain import rights_manager
 from core.platform import models
 (user_models,) = models.Registry.import_models([models.NAMES.user])
-import feconf
 import utils
 
 
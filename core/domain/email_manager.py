@@ -21,6 +21,7 @@ __author__ = 'Sean Lip'
 
 import datetime
 import logging
+import re
 
 from core.domain import config_domain
 from core.domain import html_cleaner
@@ -29,9 +30,11 @@ from core.domain import user_services
 from core.platform import models
 (email_models,) = models.Registry.import_models([models.NAMES.email])
 email_services = models.Registry.import_email_services()
-transaction_services = models.Registry.import_transaction_services()
+taskqueue_services = models.Registry.import_taskqueue_services()
 import feconf
 
+import jinja2
+
 
 # Stub for logging.error(), so that it can be swapped out in tests.
 log_new_error = logging.error
@@ -77,69 +80,222 @@ SIGNUP_EMAIL_CONTENT = config_domain.ConfigProperty(
     })
 
 
+# The environment used to compile the bodies of system-generated emails. The
+# templates below are compiled once, when this module is imported.
+# Autoescaping is disabled because the interpolated values are HTML (or
+# plaintext derived from it) that has already been sanitized by _send_email().
+_EMAIL_BODY_TEMPLATE_ENV = jinja2.Environment(
+    autoescape=False, auto_reload=False, cache_size=-1)
+
+# Compiled templates for email bodies, keyed by email intent. Each value is a
+# dict with two keys: 'html' (the template for the HTML body) and
+# 'plaintext' (the template for the corresponding plaintext body). Both
+# templates take the same parameters.
+_EMAIL_BODY_TEMPLATES = {
+    email_models.INTENT_SIGNUP: {
+        'html': _EMAIL_BODY_TEMPLATE_ENV.from_string(
+            'Hi {{ username }},<br><br>{{ body }}<br><br>{{ footer }}'),
+        'plaintext': _EMAIL_BODY_TEMPLATE_ENV.from_string(
+            'Hi {{ username }},\n\n{{ body }}\n\n{{ footer }}'),
+    },
+}
+
+# The templates used for intents that do not have an entry in
+# _EMAIL_BODY_TEMPLATES. These take a single parameter, 'body', which is the
+# complete (pre-rendered) HTML body of the email.
+_DEFAULT_EMAIL_BODY_TEMPLATES = {
+    'html': _EMAIL_BODY_TEMPLATE_ENV.from_string('{{ body }}'),
+    'plaintext': _EMAIL_BODY_TEMPLATE_ENV.from_string('{{ body }}'),
+}
+
+# Cache of the cleaned HTML and plaintext versions of static email content
+# (i.e., content that does not depend on the recipient, such as the values of
+# the config properties above). The keys are the original HTML strings, so a
+# change to a config property results in a cache miss rather than a stale
+# hit; this also holds across instances, which do not share this cache. The
+# values are (cleaned_html, plaintext) tuples.
+_CLEANED_CONTENT_CACHE = {}
+
+
+# Matches the HTML fragments that are converted to line breaks when
+# generating the plaintext body of an email, so that the conversion takes a
+# single pass over the HTML.
+_LINE_BREAK_HTML_REGEX = re.compile(r'<br/?>|</p><p>')
+_LINE_BREAK_HTML_REPLACEMENTS = {
+    '<br/>': '\n',
+    '<br>': '\n',
+    '</p><p>': '</p>\n<p>',
+}
+
+
+def _is_system_committer(sender_id):
+    return sender_id == feconf.SYSTEM_COMMITTER_ID
+
+
+def _is_admin(sender_id):
+    return rights_manager.Actor(sender_id).is_admin()
+
+
+def _is_moderator(sender_id):
+    return rights_manager.Actor(sender_id).is_moderator()
+
+
 SENDER_VALIDATORS = {
-    email_models.INTENT_SIGNUP: (lambda x: x == feconf.SYSTEM_COMMITTER_ID),
-    email_models.INTENT_DAILY_BATCH: (
-        lambda x: x == feconf.SYSTEM_COMMITTER_ID),
-    email_models.INTENT_MARKETING: (
-        lambda x: rights_manager.Actor(x).is_admin()),
-    email_models.INTENT_PUBLICIZE_EXPLORATION: (
-        lambda x: rights_manager.Actor(x).is_moderator()),
-    email_models.INTENT_UNPUBLISH_EXPLORATION: (
-        lambda x: rights_manager.Actor(x).is_moderator()),
-    email_models.INTENT_DELETE_EXPLORATION: (
-        lambda x: rights_manager.Actor(x).is_moderator()),
+    email_models.INTENT_SIGNUP: _is_system_committer,
+    email_models.INTENT_DAILY_BATCH: _is_system_committer,
+    email_models.INTENT_MARKETING: _is_admin,
+    email_models.INTENT_PUBLICIZE_EXPLORATION: _is_moderator,
+    email_models.INTENT_UNPUBLISH_EXPLORATION: _is_moderator,
+    email_models.INTENT_DELETE_EXPLORATION: _is_moderator,
 }
 
 
 def _require_sender_id_is_valid(intent, sender_id):
-    if intent not in SENDER_VALIDATORS:
+    validator = SENDER_VALIDATORS.get(intent)
+    if validator is None:
         raise Exception('Invalid email intent string: %s' % intent)
-    else:
-        if not SENDER_VALIDATORS[intent](sender_id):
-            logging.error(
-                'Invalid sender_id %s for email with intent \'%s\'' %
-                (sender_id, intent))
-            raise Exception(
-                'Invalid sender_id for email with intent \'%s\'' % intent)
+    elif not validator(sender_id):
+        logging.error(
+            'Invalid sender_id %s for email with intent \'%s\'' %
+            (sender_id, intent))
+        raise Exception(
+            'Invalid sender_id for email with intent \'%s\'' % intent)
+
+
+def _clean_email_html(html):
+    """Returns a (cleaned_html, plaintext) tuple for the given HTML string."""
+    # Alphanumeric strings (such as usernames) contain no markup, so they are
+    # unchanged by cleaning and by tag stripping. This skips the HTML
+    # sanitizer for most recipient-specific values.
+    if re.match(feconf.ALPHANUMERIC_REGEX, html):
+        return (html, html)
+
+    cleaned_html = html_cleaner.clean(html)
+    raw_plaintext = _LINE_BREAK_HTML_REGEX.sub(
+        lambda match: _LINE_BREAK_HTML_REPLACEMENTS[match.group(0)],
+        cleaned_html)
+    return (cleaned_html, html_cleaner.strip_html_tags(raw_plaintext))
+
+
+def _get_cleaned_static_email_html(html):
+    """Returns a (cleaned_html, plaintext) tuple for the given HTML string,
+    which should not depend on the recipient of the email. The result is
+    cached.
+    """
+    if html not in _CLEANED_CONTENT_CACHE:
+        _CLEANED_CONTENT_CACHE[html] = _clean_email_html(html)
+    return _CLEANED_CONTENT_CACHE[html]
 
 
 def _send_email(
-        recipient_id, sender_id, intent, email_subject, email_html_body):
+        recipient_id, sender_id, intent, email_subject, static_params,
+        recipient_params):
     """Sends an email to the given recipient.
 
     This function should be used for sending all user-facing emails.
 
+    The body of the email is generated from the templates in
+    _EMAIL_BODY_TEMPLATES[intent], using the HTML values in static_params and
+    recipient_params. If there are no templates for the intent, the body is
+    the HTML value of the 'body' parameter, which must be given in one of
+    static_params or recipient_params. The values in static_params must not
+    depend on the recipient (e.g. they are the values of config properties);
+    their cleaned versions are cached. The values in recipient_params (e.g.
+    the recipient's username) are cleaned on every call.
+
     Raises an Exception if the sender_id is not appropriate for the given
-    intent. Currently we support only system-generated emails and emails
+    intent, or if the intent has no templates and no 'body' parameter is
+    given. Currently we support only system-generated emails and emails
     initiated by moderator actions.
     """
     _require_sender_id_is_valid(intent, sender_id)
 
+    if (intent not in _EMAIL_BODY_TEMPLATES and
+            'body' not in static_params and 'body' not in recipient_params):
+        raise Exception(
+            'No body was given for email with intent \'%s\'' % intent)
+
     recipient_email = user_services.get_email_from_user_id(recipient_id)
-    cleaned_html_body = html_cleaner.clean(email_html_body)
-    if cleaned_html_body != email_html_body:
-        log_new_error(
-            'Original email HTML body does not match cleaned HTML body:\n'
-            'Original:\n%s\n\nCleaned:\n%s\n' %
-            (email_html_body, cleaned_html_body))
-        return
-
-    raw_plaintext_body = cleaned_html_body.replace('<br/>', '\n').replace(
-        '<br>', '\n').replace('</p><p>', '</p>\n<p>')
-    cleaned_plaintext_body = html_cleaner.strip_html_tags(raw_plaintext_body)
-
-    def _send_email_in_transaction():
-        sender_email = '%s <%s>' % (
-            EMAIL_SENDER_NAME.value, feconf.SYSTEM_EMAIL_ADDRESS)
+
+    html_params = {}
+    plaintext_params = {}
+    for (params, clean_fn) in [
+            (static_params, _get_cleaned_static_email_html),
+            (recipient_params, _clean_email_html)]:
+        for key, value in params.iteritems():
+            cleaned_html, plaintext = clean_fn(value)
+            if cleaned_html != value:
+                log_new_error(
+                    'Original email HTML body does not match cleaned HTML '
+                    'body:\nOriginal:\n%s\n\nCleaned:\n%s\n' %
+                    (value, cleaned_html))
+                return
+            html_params[key] = cleaned_html
+            plaintext_params[key] = plaintext
+
+    templates = _EMAIL_BODY_TEMPLATES.get(
+        intent, _DEFAULT_EMAIL_BODY_TEMPLATES)
+    cleaned_html_body = templates['html'].render(html_params)
+    cleaned_plaintext_body = templates['plaintext'].render(plaintext_params)
+
+    taskqueue_services.defer_to_emails_queue(_send_and_record_email, {
+        'recipient_id': recipient_id,
+        'recipient_email': recipient_email,
+        'sender_id': sender_id,
+        'sender_email': '%s <%s>' % (
+            EMAIL_SENDER_NAME.value, feconf.SYSTEM_EMAIL_ADDRESS),
+        'intent': intent,
+        'subject': email_subject,
+        'html_body': cleaned_html_body,
+        'plaintext_body': cleaned_plaintext_body,
+    })
+
+
+def _send_and_record_email(email_dict):
+    """Sends the given email, and then records it in the datastore.
+
+    This is run as a deferred task on the emails queue; use _send_email()
+    rather than calling it directly.
+
+    The task is retried (up to the task retry limit for the emails queue in
+    queue.yaml) only if the email was not sent. Failures that a retry cannot
+    fix (the configuration forbidding emails from being sent, or a malformed
+    email address), and any failure after the email has been sent, raise
+    taskqueue_services.PermanentTaskFailure instead, so that the recipient
+    never receives the same email twice.
+
+    Args:
+      - email_dict: dict with the following keys: recipient_id,
+          recipient_email, sender_id, sender_email, intent, subject,
+          html_body, plaintext_body. The bodies should already have been
+          cleaned.
+    """
+    if not feconf.CAN_SEND_EMAILS_TO_USERS:
+        raise taskqueue_services.PermanentTaskFailure(
+            'This app cannot send emails to users.')
+
+    try:
         email_services.send_mail(
-            sender_email, recipient_email, email_subject,
-            cleaned_plaintext_body, cleaned_html_body)
-        email_models.SentEmailModel.create(
-            recipient_id, recipient_email, sender_id, sender_email, intent,
-            email_subject, cleaned_html_body, datetime.datetime.utcnow())
+            email_dict['sender_email'], email_dict['recipient_email'],
+            email_dict['subject'], email_dict['plaintext_body'],
+            email_dict['html_body'])
+    except ValueError as e:
+        # This is raised by email_services.send_mail() if an email address
+        # is malformed.
+        raise taskqueue_services.PermanentTaskFailure(unicode(e))
 
-    return transaction_services.run_in_transaction(_send_email_in_transaction)
+    try:
+        email_models.SentEmailModel.create(
+            email_dict['recipient_id'], email_dict['recipient_email'],
+            email_dict['sender_id'], email_dict['sender_email'],
+            email_dict['intent'], email_dict['subject'],
+            email_dict['html_body'], datetime.datetime.utcnow())
+    except Exception as e:
+        log_new_error(
+            'Email with intent \'%s\' was sent to %s but could not be '
+            'recorded: %s' % (
+                email_dict['intent'], email_dict['recipient_id'], e))
+        raise taskqueue_services.PermanentTaskFailure(unicode(e))
 
 
 def send_post_signup_email(user_id):
@@ -148,7 +304,10 @@ def send_post_signup_email(user_id):
     The caller is responsible for ensuring that emails are allowed to be sent
     to users (i.e. feconf.CAN_SEND_EMAILS_TO_USERS is True).
     """
-    for key, content in SIGNUP_EMAIL_CONTENT.value.iteritems():
+    # Each access to ConfigProperty.value involves a memcache (and possibly
+    # datastore) lookup, so the value is only retrieved once.
+    email_content = SIGNUP_EMAIL_CONTENT.value
+    for key, content in email_content.iteritems():
         if content == SIGNUP_EMAIL_CONTENT.default_value[key]:
             log_new_error(
                 'Please ensure that the value for the admin config property '
@@ -157,12 +316,11 @@ def send_post_signup_email(user_id):
             return
 
     user_settings = user_services.get_user_settings(user_id)
-    email_subject = SIGNUP_EMAIL_CONTENT.value['subject']
-    email_body = 'Hi %s,<br><br>%s<br><br>%s' % (
-        user_settings.username,
-        SIGNUP_EMAIL_CONTENT.value['html_body'],
-        EMAIL_FOOTER.value)
-
     _send_email(
         user_id, feconf.SYSTEM_COMMITTER_ID, email_models.INTENT_SIGNUP,
-        email_subject, email_body)
+        email_content['subject'], {
+            'body': email_content['html_body'],
+            'footer': EMAIL_FOOTER.value,
+        }, {
+            'username': user_settings.username,
+        })
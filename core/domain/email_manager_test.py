@@ -18,8 +18,10 @@ __author__ = 'Sean Lip'
 
 from core.domain import config_services
 from core.domain import email_manager
+from core.domain import html_cleaner
 from core.platform import models
 (email_models,) = models.Registry.import_models([models.NAMES.email])
+taskqueue_services = models.Registry.import_taskqueue_services()
 from core.tests import test_utils
 import feconf
 
@@ -84,6 +86,49 @@ class EmailRightsTest(test_utils.GenericTestBase):
                 'invalid_intent', self.ADMIN_ID)
 
 
+class EmailBodyTests(test_utils.GenericTestBase):
+    """Test that email bodies are generated correctly for each intent."""
+
+    def setUp(self):
+        super(EmailBodyTests, self).setUp()
+        self.signup(self.EDITOR_EMAIL, self.EDITOR_USERNAME)
+        self.EDITOR_ID = self.get_user_id_from_email(self.EDITOR_EMAIL)
+
+        self.signup(self.MODERATOR_EMAIL, self.MODERATOR_USERNAME)
+        self.MODERATOR_ID = self.get_user_id_from_email(self.MODERATOR_EMAIL)
+        self.set_moderators([self.MODERATOR_EMAIL])
+
+    def test_email_for_intent_without_templates_uses_given_body(self):
+        with self.swap(feconf, 'CAN_SEND_EMAILS_TO_USERS', True):
+            email_manager._send_email(
+                self.EDITOR_ID, self.MODERATOR_ID,
+                email_models.INTENT_UNPUBLISH_EXPLORATION,
+                'Exploration unpublished', {}, {
+                    'body': 'Your exploration was <b>unpublished</b>.',
+                })
+            self.process_and_flush_pending_tasks()
+
+        messages = self.mail_stub.get_sent_messages(to=self.EDITOR_EMAIL)
+        self.assertEqual(1, len(messages))
+        self.assertEqual(messages[0].subject, 'Exploration unpublished')
+        self.assertEqual(
+            messages[0].html.decode(),
+            'Your exploration was <b>unpublished</b>.')
+        self.assertEqual(
+            messages[0].body.decode(), 'Your exploration was unpublished.')
+
+    def test_email_for_intent_without_templates_requires_body(self):
+        with self.swap(feconf, 'CAN_SEND_EMAILS_TO_USERS', True):
+            with self.assertRaisesRegexp(Exception, 'No body was given'):
+                email_manager._send_email(
+                    self.EDITOR_ID, self.MODERATOR_ID,
+                    email_models.INTENT_UNPUBLISH_EXPLORATION,
+                    'Exploration unpublished', {}, {})
+
+        self.assertEqual(self.count_jobs_in_taskqueue(
+            queue_name=taskqueue_services.QUEUE_NAME_EMAILS), 0)
+
+
 class SignupEmailTests(test_utils.GenericTestBase):
     """Test that signup-email sending functionality works as expected."""
 
@@ -140,6 +185,8 @@ class SignupEmailTests(test_utils.GenericTestBase):
                 'username': self.EDITOR_USERNAME
             }, csrf_token=csrf_token)
 
+            self.process_and_flush_pending_tasks()
+
             # Check that no email was sent.
             messages = self.mail_stub.get_sent_messages(to=self.EDITOR_EMAIL)
             self.assertEqual(0, len(messages))
@@ -178,6 +225,8 @@ class SignupEmailTests(test_utils.GenericTestBase):
                 'SIGNUP_EMAIL_CONTENT is set, before allowing post-signup '
                 'emails to be sent.')
 
+            self.process_and_flush_pending_tasks()
+
             # Check that no email was sent.
             messages = self.mail_stub.get_sent_messages(to=self.EDITOR_EMAIL)
             self.assertEqual(0, len(messages))
@@ -224,6 +273,8 @@ class SignupEmailTests(test_utils.GenericTestBase):
                 'SIGNUP_EMAIL_CONTENT is set, before allowing post-signup '
                 'emails to be sent.')
 
+            self.process_and_flush_pending_tasks()
+
             # Check that no email was sent.
             messages = self.mail_stub.get_sent_messages(to=self.EDITOR_EMAIL)
             self.assertEqual(0, len(messages))
@@ -265,6 +316,8 @@ class SignupEmailTests(test_utils.GenericTestBase):
             self.assertTrue(logged_errors[0].startswith(
                 'Original email HTML body does not match cleaned HTML body'))
 
+            self.process_and_flush_pending_tasks()
+
             # Check that no email was sent.
             messages = self.mail_stub.get_sent_messages(to=self.EDITOR_EMAIL)
             self.assertEqual(0, len(messages))
@@ -290,6 +343,11 @@ class SignupEmailTests(test_utils.GenericTestBase):
                 'username': self.EDITOR_USERNAME
             }, csrf_token=csrf_token)
 
+            # The email is sent by a task on the emails queue.
+            self.assertEqual(self.count_jobs_in_taskqueue(
+                queue_name=taskqueue_services.QUEUE_NAME_EMAILS), 1)
+            self.process_and_flush_pending_tasks()
+
             # Check that an email was sent with the correct content.
             messages = self.mail_stub.get_sent_messages(to=self.EDITOR_EMAIL)
             self.assertEqual(1, len(messages))
@@ -323,6 +381,8 @@ class SignupEmailTests(test_utils.GenericTestBase):
                 'username': self.EDITOR_USERNAME
             }, csrf_token=csrf_token)
 
+            self.process_and_flush_pending_tasks()
+
             # Check that an email was sent.
             messages = self.mail_stub.get_sent_messages(to=self.EDITOR_EMAIL)
             self.assertEqual(1, len(messages))
@@ -333,6 +393,8 @@ class SignupEmailTests(test_utils.GenericTestBase):
                 'username': self.EDITOR_USERNAME
             }, csrf_token=csrf_token)
 
+            self.process_and_flush_pending_tasks()
+
             # Check that no new email was sent.
             messages = self.mail_stub.get_sent_messages(to=self.EDITOR_EMAIL)
             self.assertEqual(1, len(messages))
@@ -356,6 +418,8 @@ class SignupEmailTests(test_utils.GenericTestBase):
             },
             csrf_token=csrf_token, expect_errors=True, expected_status_int=400)
 
+            self.process_and_flush_pending_tasks()
+
             # Check that no email was sent.
             messages = self.mail_stub.get_sent_messages(to=self.EDITOR_EMAIL)
             self.assertEqual(0, len(messages))
@@ -366,6 +430,8 @@ class SignupEmailTests(test_utils.GenericTestBase):
                 'username': self.EDITOR_USERNAME
             }, csrf_token=csrf_token)
 
+            self.process_and_flush_pending_tasks()
+
             # Check that a new email was sent.
             messages = self.mail_stub.get_sent_messages(to=self.EDITOR_EMAIL)
             self.assertEqual(1, len(messages))
@@ -394,6 +460,8 @@ class SignupEmailTests(test_utils.GenericTestBase):
                 'username': self.EDITOR_USERNAME
             }, csrf_token=csrf_token)
 
+            self.process_and_flush_pending_tasks()
+
             # Check that a new email was sent.
             messages = self.mail_stub.get_sent_messages(to=self.EDITOR_EMAIL)
             self.assertEqual(1, len(messages))
@@ -422,3 +490,142 @@ class SignupEmailTests(test_utils.GenericTestBase):
                 sent_email_model.subject, 'Welcome!')
             self.assertEqual(
                 sent_email_model.html_body, self.EXPECTED_HTML_EMAIL_CONTENT)
+
+    def test_static_email_content_is_only_cleaned_once(self):
+        self.signup(self.EDITOR_EMAIL, self.EDITOR_USERNAME)
+        editor_id = self.get_user_id_from_email(self.EDITOR_EMAIL)
+        self.signup(self.VIEWER_EMAIL, self.VIEWER_USERNAME)
+        viewer_id = self.get_user_id_from_email(self.VIEWER_EMAIL)
+
+        config_services.set_property(
+            self.ADMIN_ID, email_manager.EMAIL_FOOTER.name, self.NEW_FOOTER)
+        config_services.set_property(
+            self.ADMIN_ID, email_manager.SIGNUP_EMAIL_CONTENT.name,
+            self.NEW_EMAIL_CONTENT)
+
+        clean_counter = test_utils.CallCounter(html_cleaner.clean)
+        can_send_emails_ctx = self.swap(
+            feconf, 'CAN_SEND_EMAILS_TO_USERS', True)
+        clean_ctx = self.swap(html_cleaner, 'clean', clean_counter)
+        cache_ctx = self.swap(email_manager, '_CLEANED_CONTENT_CACHE', {})
+
+        with can_send_emails_ctx, clean_ctx, cache_ctx:
+            # The body and the footer are cleaned. The username is
+            # alphanumeric, so it does not need to be cleaned.
+            email_manager.send_post_signup_email(editor_id)
+            self.assertEqual(clean_counter.times_called, 2)
+
+            # For the second email, nothing needs to be cleaned.
+            email_manager.send_post_signup_email(viewer_id)
+            self.assertEqual(clean_counter.times_called, 2)
+
+            self.process_and_flush_pending_tasks()
+
+        messages = self.mail_stub.get_sent_messages(to=self.VIEWER_EMAIL)
+        self.assertEqual(1, len(messages))
+        self.assertEqual(
+            messages[0].html.decode(),
+            self.EXPECTED_HTML_EMAIL_CONTENT.replace(
+                self.EDITOR_USERNAME, self.VIEWER_USERNAME))
+
+
+class EmailTaskTests(test_utils.GenericTestBase):
+    """Test the deferred task that sends and records an email."""
+
+    def setUp(self):
+        super(EmailTaskTests, self).setUp()
+
+        self.EMAIL_DICT = {
+            'recipient_id': 'recipient_id',
+            'recipient_email': 'recipient@example.com',
+            'sender_id': feconf.SYSTEM_COMMITTER_ID,
+            'sender_email': 'Email Sender <%s>' % feconf.SYSTEM_EMAIL_ADDRESS,
+            'intent': email_models.INTENT_SIGNUP,
+            'subject': 'Welcome!',
+            'html_body': 'Hi <b>recipient</b>',
+            'plaintext_body': 'Hi recipient',
+        }
+
+    def test_email_task_sends_and_records_email(self):
+        with self.swap(feconf, 'CAN_SEND_EMAILS_TO_USERS', True):
+            email_manager._send_and_record_email(self.EMAIL_DICT)
+
+        messages = self.mail_stub.get_sent_messages(
+            to='recipient@example.com')
+        self.assertEqual(1, len(messages))
+        all_models = email_models.SentEmailModel.get_all().fetch()
+        self.assertEqual(len(all_models), 1)
+        self.assertEqual(all_models[0].recipient_id, 'recipient_id')
+
+    def test_email_task_fails_permanently_if_emails_cannot_be_sent(self):
+        with self.swap(feconf, 'CAN_SEND_EMAILS_TO_USERS', False):
+            with self.assertRaisesRegexp(
+                    taskqueue_services.PermanentTaskFailure,
+                    'cannot send emails'):
+                email_manager._send_and_record_email(self.EMAIL_DICT)
+
+        messages = self.mail_stub.get_sent_messages(
+            to='recipient@example.com')
+        self.assertEqual(0, len(messages))
+        self.assertEqual(
+            email_models.SentEmailModel.get_all().count(), 0)
+
+    def test_email_task_fails_permanently_if_address_is_malformed(self):
+        self.EMAIL_DICT['recipient_email'] = ''
+
+        with self.swap(feconf, 'CAN_SEND_EMAILS_TO_USERS', True):
+            with self.assertRaisesRegexp(
+                    taskqueue_services.PermanentTaskFailure,
+                    'Malformed recipient email address'):
+                email_manager._send_and_record_email(self.EMAIL_DICT)
+
+        self.assertEqual(
+            email_models.SentEmailModel.get_all().count(), 0)
+
+    def test_other_email_task_failures_are_retried(self):
+        def _send_mail_with_transient_failure(*args):
+            raise Exception('Transient failure.')
+
+        send_mail_ctx = self.swap(
+            email_manager.email_services, 'send_mail',
+            _send_mail_with_transient_failure)
+
+        with self.swap(feconf, 'CAN_SEND_EMAILS_TO_USERS', True):
+            with send_mail_ctx:
+                # This is not a PermanentTaskFailure, so the task queue will
+                # retry the task.
+                with self.assertRaisesRegexp(Exception, 'Transient failure'):
+                    email_manager._send_and_record_email(self.EMAIL_DICT)
+
+        self.assertEqual(
+            email_models.SentEmailModel.get_all().count(), 0)
+
+    def test_email_task_fails_permanently_if_sent_email_is_not_recorded(self):
+        def _initial_put_with_failure(model_instance):
+            raise Exception('Datastore write failed.')
+
+        logged_errors = []
+
+        def _log_error_for_tests(error_message):
+            logged_errors.append(error_message)
+
+        initial_put_ctx = self.swap(
+            email_models.SentEmailModel, '_initial_put',
+            _initial_put_with_failure)
+        log_new_error_ctx = self.swap(
+            email_manager, 'log_new_error', _log_error_for_tests)
+
+        with self.swap(feconf, 'CAN_SEND_EMAILS_TO_USERS', True):
+            with initial_put_ctx, log_new_error_ctx:
+                # The email has already been sent, so the task must not be
+                # retried.
+                with self.assertRaisesRegexp(
+                        taskqueue_services.PermanentTaskFailure,
+                        'Datastore write failed'):
+                    email_manager._send_and_record_email(self.EMAIL_DICT)
+
+        messages = self.mail_stub.get_sent_messages(
+            to='recipient@example.com')
+        self.assertEqual(1, len(messages))
+        self.assertEqual(len(logged_errors), 1)
+        self.assertIn('could not be recorded', logged_errors[0])
@@ -18,7 +18,7 @@
 
 __author__ = 'Frederik Creemers'
 
-import ast
+import json
 import logging
 
 from core import jobs
@@ -75,17 +75,27 @@ class ExplorationFirstPublishedOneOffJob(jobs.BaseMapReduceJobManager):
 
     @staticmethod
     def reduce(exp_id, stringified_commit_times_msecs):
-        commit_times_msecs = [
-            ast.literal_eval(commit_time_string) for
-            commit_time_string in stringified_commit_times_msecs]
-        first_published_msec = min(commit_times_msecs)
+        # The mapped values are stringified floats, so they can be decoded
+        # with float() rather than by parsing them as Python literals.
+        first_published_msec = min(
+            float(commit_time_string) for
+            commit_time_string in stringified_commit_times_msecs)
         rights_manager.update_activity_first_published_msec(
             rights_manager.ACTIVITY_TYPE_EXPLORATION, exp_id,
             first_published_msec)
 
 
 class IndexAllExplorationsJobManager(jobs.BaseMapReduceJobManager):
-    """One-off job that indexes all explorations"""
+    """One-off job that indexes all explorations. The mapper only collects the
+    exploration ids; the reducer indexes them in batches, so that each call to
+    the search service adds many documents at once.
+    """
+
+    # The maximum number of explorations to index in a single call to the
+    # search service.
+    INDEX_BATCH_SIZE = 200
+
+    _REDUCE_KEY = 'index'
 
     @classmethod
     def entity_classes_to_map_over(cls):
@@ -94,7 +104,14 @@ class IndexAllExplorationsJobManager(jobs.BaseMapReduceJobManager):
     @staticmethod
     def map(item):
         if not item.deleted:
-            exp_services.index_explorations_given_ids([item.id])
+            yield (IndexAllExplorationsJobManager._REDUCE_KEY, item.id)
+
+    @staticmethod
+    def reduce(key, exp_ids):
+        batch_size = IndexAllExplorationsJobManager.INDEX_BATCH_SIZE
+        for ind in range(0, len(exp_ids), batch_size):
+            exp_services.index_explorations_given_ids(
+                exp_ids[ind:ind + batch_size])
 
 
 class ExplorationValidityJobManager(jobs.BaseMapReduceJobManager):
@@ -111,9 +128,16 @@ class ExplorationValidityJobManager(jobs.BaseMapReduceJobManager):
         if item.deleted:
             return
 
-        exploration = exp_services.get_exploration_from_model(item)
-        exp_rights = rights_manager.get_exploration_rights(item.id)
+        # Fetch the rights before building the exploration domain object
+        # (which may involve a states schema migration), so that the
+        # latter is skipped if the exploration has no rights model.
+        exp_rights = rights_manager.get_exploration_rights(
+            item.id, strict=False)
+        if exp_rights is None:
+            yield (item.id, 'Exploration rights model not found.')
+            return
 
+        exploration = exp_services.get_exploration_from_model(item)
         try:
             if exp_rights.status == rights_manager.ACTIVITY_STATUS_PRIVATE:
                 exploration.validate()
@@ -145,8 +169,10 @@ class ExplorationMigrationJobManager(jobs.BaseMapReduceJobManager):
         if item.deleted:
             return
 
-        # Do not upgrade explorations that fail non-strict validation.
-        old_exploration = exp_services.get_exploration_by_id(item.id)
+        # Do not upgrade explorations that fail non-strict validation. Note
+        # that building the domain object from the model performs the states
+        # schema migration in memory.
+        old_exploration = exp_services.get_exploration_from_model(item)
         try:
             old_exploration.validate()
         except Exception as e:
@@ -159,8 +185,9 @@ class ExplorationMigrationJobManager(jobs.BaseMapReduceJobManager):
         # most up-to-date states schema version, then update it.
         if (item.states_schema_version !=
                 feconf.CURRENT_EXPLORATION_STATES_SCHEMA_VERSION):
-            # Note: update_exploration does not need to apply a change list in
-            # order to perform a migration. See the related comment in
+            # Note: the migration has already been applied to old_exploration,
+            # so it can be saved directly, without reloading it and applying
+            # the change list. See the related comment in
             # exp_services.apply_change_list for more information.
             commit_cmds = [{
                 'cmd': exp_domain.CMD_MIGRATE_STATES_SCHEMA_TO_LATEST_VERSION,
@@ -168,8 +195,8 @@ class ExplorationMigrationJobManager(jobs.BaseMapReduceJobManager):
                 'to_version': str(
                     feconf.CURRENT_EXPLORATION_STATES_SCHEMA_VERSION)
             }]
-            exp_services.update_exploration(
-                feconf.MIGRATION_BOT_USERNAME, item.id, commit_cmds,
+            exp_services.update_exploration_from_object(
+                feconf.MIGRATION_BOT_USERNAME, old_exploration, commit_cmds,
                 'Update exploration states from schema version %d to %d.' % (
                     item.states_schema_version,
                     feconf.CURRENT_EXPLORATION_STATES_SCHEMA_VERSION))
@@ -198,9 +225,11 @@ class InteractionAuditOneOffJob(jobs.BaseMapReduceJobManager):
 
         exploration = exp_services.get_exploration_from_model(item)
         for state_name, state in exploration.states.iteritems():
-            exp_and_state_key = '%s %s' % (item.id, state_name)
-            yield (state.interaction.id, exp_and_state_key)
+            # Values are converted to strings by the MapReduce framework, so
+            # the (exploration id, state name) pair is encoded as JSON so that
+            # the reducer can decode it unambiguously.
+            yield (state.interaction.id, json.dumps((item.id, state_name)))
 
     @staticmethod
-    def reduce(key, values):
-        yield (key, values)
+    def reduce(key, stringified_values):
+        yield (key, [json.loads(value) for value in stringified_values])
@@ -334,6 +334,64 @@ class OneOffReindexExplorationsJobTest(test_utils.GenericTestBase):
             self.assertIn('title %d' % i, titles)
             self.assertIn('category%d' % i, categories)
 
+    def test_explorations_are_indexed_in_batches(self):
+        job_id = (exp_jobs_one_off.IndexAllExplorationsJobManager.create_new())
+        exp_jobs_one_off.IndexAllExplorationsJobManager.enqueue(job_id)
+
+        indexed_doc_batches = []
+
+        def add_docs_mock(docs, index):
+            indexed_doc_batches.append(docs)
+
+        add_docs_swap = self.swap(
+            search_services, 'add_documents_to_index', add_docs_mock)
+        batch_size_swap = self.swap(
+            exp_jobs_one_off.IndexAllExplorationsJobManager,
+            'INDEX_BATCH_SIZE', 2)
+
+        with add_docs_swap, batch_size_swap:
+            self.process_and_flush_pending_tasks()
+
+        # The five explorations are indexed in batches of at most two.
+        self.assertEqual(
+            sorted([len(batch) for batch in indexed_doc_batches]), [1, 2, 2])
+        self.assertEqual(
+            sorted([doc['id'] for batch in indexed_doc_batches
+                    for doc in batch]),
+            ['%s%s' % (self.EXP_ID, i) for i in xrange(5)])
+
+
+class ExplorationValidityJobManagerTest(test_utils.GenericTestBase):
+
+    VALID_EXP_ID = 'exp_id0'
+    EXP_ID_WITHOUT_RIGHTS = 'exp_id1'
+
+    def setUp(self):
+        super(ExplorationValidityJobManagerTest, self).setUp()
+
+        self.signup(self.OWNER_EMAIL, self.OWNER_USERNAME)
+        self.owner_id = self.get_user_id_from_email(self.OWNER_EMAIL)
+
+        self.save_new_valid_exploration(self.VALID_EXP_ID, self.owner_id)
+        self.save_new_valid_exploration(
+            self.EXP_ID_WITHOUT_RIGHTS, self.owner_id)
+
+    def test_exploration_without_rights_model_is_reported(self):
+        # Remove the rights model of one of the explorations directly from the
+        # datastore.
+        exp_models.ExplorationRightsModel.get_by_id(
+            self.EXP_ID_WITHOUT_RIGHTS).key.delete()
+
+        job_id = exp_jobs_one_off.ExplorationValidityJobManager.create_new()
+        exp_jobs_one_off.ExplorationValidityJobManager.enqueue(job_id)
+        self.process_and_flush_pending_tasks()
+
+        # The valid exploration is not reported.
+        self.assertEqual(
+            exp_jobs_one_off.ExplorationValidityJobManager.get_output(job_id),
+            [[self.EXP_ID_WITHOUT_RIGHTS,
+              ['Exploration rights model not found.']]])
+
 
 class ExplorationMigrationJobTest(test_utils.GenericTestBase):
 
@@ -406,6 +464,54 @@ class ExplorationMigrationJobTest(test_utils.GenericTestBase):
         self.assertNotEqual(
             updated_exp.to_dict()['states'], self.VERSION_0_STATES_DICT)
 
+    def test_migration_job_commits_one_version_without_reloading_exp(self):
+        """Tests that the exploration migration job commits the exploration it
+        migrated in memory as a single new version, without loading the
+        exploration again in order to apply the change list.
+        """
+        self.save_new_exp_with_states_schema_v0(
+            self.NEW_EXP_ID, self.ALBERT_ID, self.EXP_TITLE)
+
+        get_exploration_by_id_counter = test_utils.CallCounter(
+            exp_services.get_exploration_by_id)
+        apply_change_list_counter = test_utils.CallCounter(
+            exp_services.apply_change_list)
+        get_exploration_by_id_swap = self.swap(
+            exp_services, 'get_exploration_by_id',
+            get_exploration_by_id_counter)
+        apply_change_list_swap = self.swap(
+            exp_services, 'apply_change_list', apply_change_list_counter)
+
+        # Start migration job on sample exploration.
+        job_id = exp_jobs_one_off.ExplorationMigrationJobManager.create_new()
+        exp_jobs_one_off.ExplorationMigrationJobManager.enqueue(job_id)
+        with get_exploration_by_id_swap, apply_change_list_swap:
+            self.process_and_flush_pending_tasks()
+
+        # The exploration is only loaded by id when its summary is updated.
+        self.assertEqual(apply_change_list_counter.times_called, 0)
+        self.assertEqual(get_exploration_by_id_counter.times_called, 1)
+
+        # Exactly one new version was committed, by the migration bot.
+        updated_exp = exp_services.get_exploration_by_id(self.NEW_EXP_ID)
+        self.assertEqual(updated_exp.version, 2)
+        self.assertEqual(
+            updated_exp.states_schema_version,
+            feconf.CURRENT_EXPLORATION_STATES_SCHEMA_VERSION)
+
+        snapshots_metadata = exp_services.get_exploration_snapshots_metadata(
+            self.NEW_EXP_ID)
+        self.assertEqual(len(snapshots_metadata), 2)
+        self.assertEqual(
+            snapshots_metadata[1]['committer_id'],
+            feconf.MIGRATION_BOT_USERNAME)
+        self.assertEqual(snapshots_metadata[1]['commit_cmds'], [{
+            'cmd': exp_domain.CMD_MIGRATE_STATES_SCHEMA_TO_LATEST_VERSION,
+            'from_version': '0',
+            'to_version': str(
+                feconf.CURRENT_EXPLORATION_STATES_SCHEMA_VERSION)
+        }])
+
     def test_migration_job_skips_deleted_explorations(self):
         """Tests that the exploration migration job skips deleted explorations
         and does not attempt to migrate.
@@ -940,12 +940,7 @@ def update_exploration(
         For published explorations, this must be present; for unpublished
         explorations, it should be equal to None.
     """
-    is_public = rights_manager.is_exploration_public(exploration_id)
-
-    if is_public and not commit_message:
-        raise ValueError(
-            'Exploration is public so expected a commit message but '
-            'received none.')
+    _require_commit_message_if_public(exploration_id, commit_message)
 
     exploration = apply_change_list(exploration_id, change_list)
     _save_exploration(committer_id, exploration, commit_message, change_list)
@@ -954,6 +949,43 @@ def update_exploration(
     update_exploration_summary(exploration.id)
 
 
+def update_exploration_from_object(
+        committer_id, exploration, change_list, commit_message):
+    """Commits an exploration domain object to which the given change list
+    has already been applied in memory. This avoids reloading the exploration
+    from the datastore, e.g. when persisting an exploration that was migrated
+    to the latest states schema version when it was loaded.
+
+    Args:
+    - committer_id: str. The id of the user who is performing the update
+        action.
+    - exploration: Exploration. The updated exploration domain object. Its
+        version should be the version of the exploration in the datastore.
+    - change_list: list of dicts, each representing a _Change object. These
+        should already have been applied to the exploration.
+    - commit_message: str or None. A description of changes made to the state.
+        For published explorations, this must be present; for unpublished
+        explorations, it should be equal to None.
+    """
+    _require_commit_message_if_public(exploration.id, commit_message)
+
+    _save_exploration(committer_id, exploration, commit_message, change_list)
+
+    # Update summary of changed exploration.
+    update_exploration_summary(exploration.id)
+
+
+def _require_commit_message_if_public(exploration_id, commit_message):
+    """Raises a ValueError if the exploration is public and no commit message
+    is given.
+    """
+    if (rights_manager.is_exploration_public(exploration_id) and
+            not commit_message):
+        raise ValueError(
+            'Exploration is public so expected a commit message but '
+            'received none.')
+
+
 def create_exploration_summary(exploration_id):
     """Create summary of an exploration and store in datastore."""
     exploration = get_exploration_by_id(exploration_id)
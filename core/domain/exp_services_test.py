@@ -1304,6 +1304,37 @@ class CommitMessageHandlingTests(ExplorationServicesUnitTests):
                 exp_domain.STATE_PROPERTY_INTERACTION_STICKY, True
             ), None)
 
+    def test_update_exploration_from_object(self):
+        """Check that an in-memory exploration can be committed directly, and
+        that a commit message is demanded for published explorations.
+        """
+        rights_manager.publish_exploration(self.OWNER_ID, self.EXP_ID)
+
+        exploration = exp_services.get_exploration_by_id(self.EXP_ID)
+        exploration.update_objective('A new objective')
+        change_list = [{
+            'cmd': exp_domain.CMD_EDIT_EXPLORATION_PROPERTY,
+            'property_name': 'objective',
+            'new_value': 'A new objective'
+        }]
+
+        with self.assertRaisesRegexp(
+                ValueError, 'Exploration is public so expected a commit '
+                            'message but received none.'):
+            exp_services.update_exploration_from_object(
+                self.OWNER_ID, exploration, change_list, '')
+
+        exp_services.update_exploration_from_object(
+            self.OWNER_ID, exploration, change_list, 'A message')
+
+        updated_exploration = exp_services.get_exploration_by_id(self.EXP_ID)
+        self.assertEqual(updated_exploration.objective, 'A new objective')
+        self.assertEqual(updated_exploration.version, 2)
+        self.assertEqual(
+            exp_services.get_exploration_snapshots_metadata(
+                self.EXP_ID)[1]['commit_message'],
+            'A message')
+
 
 class ExplorationSnapshotUnitTests(ExplorationServicesUnitTests):
     """Test methods relating to exploration snapshots."""
@@ -19,6 +19,7 @@
 __author__ = 'Xinyu Wu'
 
 import ast
+import heapq
 
 from core import jobs
 from core.domain import exp_services
@@ -29,6 +30,10 @@ from core.platform import models
     models.NAMES.exploration, models.NAMES.recommendations])
 
 
+# The maximum number of recommendations stored for each exploration.
+MAX_RECOMMENDATIONS = 10
+
+
 class ExplorationRecommendationsRealtimeModel(
         jobs.BaseRealtimeDatastoreClassForContinuousComputations):
     pass
@@ -94,6 +99,7 @@ class ExplorationRecommendationsMRJobManager(
             return
 
         reference_exp_summary = exp_summaries_dict[exp_summary_id]
+        other_exploration_similarities = []
         for compared_exp_id, compared_exp_summary in exp_summaries_dict.iteritems():
             if compared_exp_id != exp_summary_id:
                 similarity_score = (
@@ -107,15 +113,21 @@ class ExplorationRecommendationsMRJobManager(
                         compared_exp_summary.owner_ids,
                         compared_exp_summary.status))
                 if similarity_score >= SIMILARITY_SCORE_THRESHOLD:
-                    yield (exp_summary_id, {
+                    other_exploration_similarities.append({
                         'similarity_score': similarity_score,
                         'exp_id': compared_exp_id
                     })
 
+        # All the values for this key are emitted by this call to map(), so
+        # only the ones that could be among the final recommendations need to
+        # be passed on to the reducer.
+        for value in heapq.nlargest(
+                MAX_RECOMMENDATIONS, other_exploration_similarities,
+                key=lambda x: x['similarity_score']):
+            yield (exp_summary_id, value)
+
     @staticmethod
     def reduce(key, stringified_values):
-        MAX_RECOMMENDATIONS = 10
-
         other_exploration_similarities = sorted(
             [ast.literal_eval(v) for v in stringified_values],
             reverse=True,
@@ -18,7 +18,7 @@
 
 __author__ = 'Sean Lip'
 
-import copy
+import heapq
 import operator
 
 from core.platform import models
@@ -31,21 +31,25 @@ class StateRuleAnswerLog(object):
     All methods and properties in this file should be independent of the
     specific storage model used.
     """
+
+    # Instances of this class are created for every rule of a state when its
+    # statistics are fetched, so a per-instance __dict__ is not needed.
+    __slots__ = ('answers',)
+
     def __init__(self, answers):
         # This dict represents a log of answers that hit this rule and that
         # have not been resolved. The keys of this dict are the answers encoded
         # as HTML strings, and the values are integer counts representing how
-        # many times the answer has been entered.
-        self.answers = copy.deepcopy(answers)
+        # many times the answer has been entered. Since the keys and values
+        # are immutable, a shallow copy suffices to avoid aliasing the dict in
+        # the storage model.
+        self.answers = dict(answers)
 
     @property
     def total_answer_count(self):
         """Total count of answers for this rule that have not been resolved."""
         # TODO(sll): Cache this computed property.
-        total_count = 0
-        for answer, count in self.answers.iteritems():
-            total_count += count
-        return total_count
+        return sum(self.answers.itervalues())
 
     @classmethod
     def get_multi(cls, exploration_id, rule_data):
@@ -81,6 +85,7 @@ class StateRuleAnswerLog(object):
             A list of (answer, count) tuples for the N answers with the highest
             counts.
         """
-        return sorted(
-            self.answers.iteritems(), key=operator.itemgetter(1),
-            reverse=True)[:N]
+        # This is equivalent to sorting the answers by count and taking the
+        # first N, but runs in O(len(answers) * log N) time.
+        return heapq.nlargest(
+            N, self.answers.iteritems(), key=operator.itemgetter(1))
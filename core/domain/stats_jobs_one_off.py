@@ -16,6 +16,7 @@
 
 import ast
 import collections
+import json
 
 from core import jobs
 from core.domain import stats_jobs_continuous
@@ -125,3 +126,70 @@ class StatisticsAudit(jobs.BaseMapReduceJobManager):
                     'all: %s sum:%s' % (
                         key, state_name, all_state_hit[state_name],
                         sum_state_hit[state_name]),)
+
+
+class SetAnswersMigrationOneOffJob(jobs.BaseMapReduceJobManager):
+    """One-off job that rewrites answers to set-valued interactions (such as
+    SetInput and ItemSelectionInput) in the answer logs. These answers used to
+    be recorded as the Python repr of a list (e.g. [u'a', u'b']), which cannot
+    be reliably decoded when the elements contain commas or brackets. They
+    are now recorded as JSON arrays (e.g. ["a", "b"]), and this job converts
+    the legacy entries to that format.
+    """
+
+    @classmethod
+    def entity_classes_to_map_over(cls):
+        return [stats_models.StateRuleAnswerLogModel]
+
+    @staticmethod
+    def _migrate_answer(answer):
+        """Returns the JSON form of the given answer, if it is the repr of a
+        list of strings; otherwise, returns the answer unchanged.
+        """
+        if not answer.startswith('['):
+            return answer
+
+        try:
+            answer_list = ast.literal_eval(answer)
+        except (SyntaxError, ValueError):
+            return answer
+
+        # Check that the answer round-trips, so that answers which merely
+        # look like lists (e.g. from a TextInput) are left alone.
+        if (not isinstance(answer_list, list) or
+                not all(isinstance(item, basestring) for item in answer_list)
+                or repr(answer_list) != answer):
+            return answer
+
+        return json.dumps(answer_list, ensure_ascii=False)
+
+    @staticmethod
+    def _migrate_answer_log(answer_log_id):
+        """Migrates the answers in the given answer log. Returns True if the
+        answer log was changed.
+
+        This should be run in a transaction, so that answers recorded after
+        the answer log is fetched are not overwritten.
+        """
+        answer_log = stats_models.StateRuleAnswerLogModel.get(answer_log_id)
+        migrated_answers = collections.defaultdict(int)
+        for answer, count in answer_log.answers.iteritems():
+            migrated_answers[
+                SetAnswersMigrationOneOffJob._migrate_answer(answer)] += count
+
+        if migrated_answers == answer_log.answers:
+            return False
+
+        answer_log.answers = dict(migrated_answers)
+        answer_log.put()
+        return True
+
+    @staticmethod
+    def map(item):
+        if transaction_services.run_in_transaction(
+                SetAnswersMigrationOneOffJob._migrate_answer_log, item.id):
+            yield ('Migrated answer logs', item.id)
+
+    @staticmethod
+    def reduce(key, values):
+        yield (key, len(values))
@@ -0,0 +1,128 @@
+# coding: utf-8
+#
+# Copyright 2014 The Oppia Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS-IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for one-off statistics jobs."""
+
+from core.domain import stats_jobs_one_off
+from core.platform import models
+(stats_models,) = models.Registry.import_models([models.NAMES.statistics])
+from core.tests import test_utils
+
+
+class SetAnswersMigrationOneOffJobTest(test_utils.GenericTestBase):
+    """Tests for the one-off job that converts set-valued answers in the
+    answer logs to JSON.
+    """
+
+    EXP_ID = 'exp_id'
+    STATE_NAME = 'state_name'
+    RULE_STR = 'Default'
+
+    def _create_answer_log(self, answers):
+        answer_log = stats_models.StateRuleAnswerLogModel.get_or_create(
+            self.EXP_ID, self.STATE_NAME, self.RULE_STR)
+        answer_log.answers = answers
+        answer_log.put()
+
+    def _get_answers(self):
+        return stats_models.StateRuleAnswerLogModel.get_or_create(
+            self.EXP_ID, self.STATE_NAME, self.RULE_STR).answers
+
+    def _run_job(self):
+        job_id = stats_jobs_one_off.SetAnswersMigrationOneOffJob.create_new()
+        stats_jobs_one_off.SetAnswersMigrationOneOffJob.enqueue(job_id)
+        self.process_and_flush_pending_tasks()
+
+    def test_legacy_set_answers_are_converted_to_json(self):
+        self._create_answer_log({
+            "[u'a', u'b']": 2,
+            "[u'a, b', u']']": 3,
+            "[u'caf\\xe9']": 4,
+            '[]': 5,
+        })
+        self._run_job()
+
+        self.assertEqual(self._get_answers(), {
+            '["a", "b"]': 2,
+            '["a, b", "]"]': 3,
+            u'["caf\xe9"]': 4,
+            '[]': 5,
+        })
+
+    def test_answers_that_only_look_like_lists_are_unchanged(self):
+        answers = {
+            # TextInput answers that do not round-trip through repr().
+            "[u'a',u'b']": 1,
+            '[a, b]': 2,
+            "[u'unterminated": 3,
+            # Lists whose elements are not strings.
+            '[1, 2]': 4,
+            # Answers that are not lists at all.
+            "(u'a', u'b')": 5,
+            'plain text': 6,
+        }
+        self._create_answer_log(answers)
+        self._run_job()
+
+        self.assertEqual(self._get_answers(), answers)
+
+    def test_counts_are_merged_if_legacy_and_json_answers_collide(self):
+        self._create_answer_log({
+            "[u'a', u'b']": 2,
+            '["a", "b"]': 3,
+        })
+        self._run_job()
+
+        self.assertEqual(self._get_answers(), {'["a", "b"]': 5})
+
+    def test_job_is_idempotent(self):
+        self._create_answer_log({
+            "[u'a', u'b']": 2,
+            'plain text': 1,
+        })
+        self._run_job()
+        last_updated = stats_models.StateRuleAnswerLogModel.get_or_create(
+            self.EXP_ID, self.STATE_NAME, self.RULE_STR).last_updated
+
+        self._run_job()
+        answer_log = stats_models.StateRuleAnswerLogModel.get_or_create(
+            self.EXP_ID, self.STATE_NAME, self.RULE_STR)
+
+        self.assertEqual(answer_log.answers, {
+            '["a", "b"]': 2,
+            'plain text': 1,
+        })
+        # The second run does not write the answer log again.
+        self.assertEqual(answer_log.last_updated, last_updated)
+
+    def test_answers_recorded_after_mapper_input_is_read_are_kept(self):
+        self._create_answer_log({"[u'a', u'b']": 2})
+        answer_log_id = stats_models.StateRuleAnswerLogModel.get_or_create(
+            self.EXP_ID, self.STATE_NAME, self.RULE_STR).id
+
+        # Simulate the mapper receiving a copy of the answer log that was
+        # read before another answer was recorded.
+        stale_answer_log = stats_models.StateRuleAnswerLogModel(
+            id=answer_log_id, answers={"[u'a', u'b']": 2})
+        self._create_answer_log({"[u'a', u'b']": 2, 'new answer': 1})
+
+        list(stats_jobs_one_off.SetAnswersMigrationOneOffJob.map(
+            stale_answer_log))
+
+        self.assertEqual(self._get_answers(), {
+            '["a", "b"]': 2,
+            'new answer': 1,
+        })
@@ -36,6 +36,7 @@ ONE_OFF_JOB_MANAGERS = [
     exp_jobs_one_off.ExpSummariesCreationOneOffJob,
     exp_jobs_one_off.ExplorationValidityJobManager,
     stats_jobs_one_off.StatisticsAudit,
+    stats_jobs_one_off.SetAnswersMigrationOneOffJob,
     exp_jobs_one_off.ExplorationMigrationJobManager]
 
 # List of all ContinuousComputation managers to show controls for on the
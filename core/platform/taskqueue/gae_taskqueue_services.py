@@ -27,6 +27,8 @@ from google.appengine.ext import deferred
 QUEUE_NAME_DEFAULT = 'default'
 # Deferred queue for processing events outside the request/response cycle.
 QUEUE_NAME_EVENTS = 'events'
+# Deferred queue for sending emails outside the request/response cycle.
+QUEUE_NAME_EMAILS = 'emails'
 
 
 def defer(fn, *args, **kwargs):
@@ -41,6 +43,11 @@ def defer_to_events_queue(fn, *args, **kwargs):
     deferred.defer(fn, *args, _queue=QUEUE_NAME_EVENTS, **kwargs)
 
 
+def defer_to_emails_queue(fn, *args, **kwargs):
+    """Adds a new task to the deferred queue for sending emails."""
+    deferred.defer(fn, *args, _queue=QUEUE_NAME_EMAILS, **kwargs)
+
+
 # A special exception that ensures that the task is not tried again, if it
 # fails.
 PermanentTaskFailure = deferred.PermanentTaskFailure
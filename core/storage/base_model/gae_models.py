@@ -18,7 +18,6 @@ __author__ = 'Sean Lip'
 
 from core.platform import models
 transaction_services = models.Registry.import_transaction_services()
-import feconf
 import utils
 
 from google.appengine.datastore import datastore_query
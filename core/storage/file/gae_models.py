@@ -18,8 +18,6 @@
 
 __author__ = 'Sean Lip'
 
-import os
-
 import core.storage.base_model.gae_models as base_models
 import feconf
 import utils
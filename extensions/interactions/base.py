@@ -44,7 +44,6 @@ from core.domain import rule_domain
 from extensions import domain
 import feconf
 import jinja_utils
-import schema_utils
 import utils
 
 # Indicates that the learner view of the interaction should be displayed in the
@@ -18,6 +18,7 @@
 
 __author__ = 'Sean Lip'
 
+import json
 import os
 import re
 import string
@@ -365,3 +366,17 @@ class InteractionUnitTests(test_utils.GenericTestBase):
                 count += 1
 
         self.assertEqual(count, 1)
+
+    def test_set_valued_answers_are_logged_as_json(self):
+        """Test that answers to set-valued interactions are recorded in the
+        stats log as JSON arrays, even if their elements contain commas or
+        brackets.
+        """
+        answer = [u'a, b', u']', u'caf\xe9']
+        for interaction_id in ['ItemSelectionInput', 'SetInput']:
+            interaction = interaction_registry.Registry.get_interaction_by_id(
+                interaction_id)
+            stats_log_html = interaction.get_stats_log_html({}, answer)
+            self.assertEqual(
+                stats_log_html.strip(), u'["a, b", "]", "caf\xe9"]')
+            self.assertEqual(json.loads(stats_log_html), answer)
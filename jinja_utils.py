@@ -43,6 +43,12 @@ class JinjaConfig(object):
             string = string.replace(replacement[0], replacement[1])
         return jinja2.utils.Markup(string)
 
+    def _json_filter(value):
+        """Converts a value to a JSON string, e.g. for recording set-valued
+        answers in a form that can be decoded with json.loads().
+        """
+        return json.dumps(value, ensure_ascii=False)
+
     def _log2_floor_filter(value):
         """Returns the logarithm base 2 of the given value, rounded down."""
         return int(math.log(value, 2))
@@ -51,6 +57,7 @@ class JinjaConfig(object):
         'is_list': lambda x: isinstance(x, list),
         'is_dict': lambda x: isinstance(x, dict),
         'js_string': _js_string_filter,
+        'json': _json_filter,
         'log2_floor': _log2_floor_filter,
     }
 
@@ -124,14 +131,8 @@ def evaluate_object(obj, params):
     if isinstance(obj, basestring):
         return parse_string(obj, params)
     elif isinstance(obj, list):
-        new_list = []
-        for item in obj:
-            new_list.append(evaluate_object(item, params))
-        return new_list
+        return [evaluate_object(item, params) for item in obj]
     elif isinstance(obj, dict):
-        new_dict = {}
-        for key in obj:
-            new_dict[key] = evaluate_object(obj[key], params)
-        return new_dict
+        return {key: evaluate_object(obj[key], params) for key in obj}
     else:
         return copy.deepcopy(obj)
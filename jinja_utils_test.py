@@ -42,6 +42,20 @@ class JinjaUtilsUnitTests(test_utils.GenericTestBase):
             self.assertEqual(jinja_utils.JinjaConfig.FILTERS['js_string'](
                 tup[0]), tup[1])
 
+    def test_json_filter(self):
+        """Test json filter."""
+        expected_values = [
+            ('a', '"a"'),
+            (2, '2'),
+            ([], '[]'),
+            ([u'a', u'b, c', u'[d]'], '["a", "b, c", "[d]"]'),
+            ([u'¡Hola!'], u'["¡Hola!"]'),
+        ]
+
+        for tup in expected_values:
+            self.assertEqual(
+                jinja_utils.JinjaConfig.FILTERS['json'](tup[0]), tup[1])
+
     def test_parse_string(self):
         parsed_str = jinja_utils.parse_string('{{test}}', {'test': 'hi'})
         self.assertEqual(parsed_str, 'hi')